@@ -1,10 +1,12 @@
 import os
 import re
+import asyncio
 import httpx
+import orjson
 import secrets
 import logging
-from fastapi import FastAPI, Request, HTTPException, Header
-from typing import Any, Dict, Optional
+from fastapi import FastAPI, Request, HTTPException, Header, BackgroundTasks
+from typing import Any, Dict, List, Optional
 
 from .reviewer import CodeReviewer
 from .github import GitHubClient
@@ -22,6 +24,14 @@ AUTH_TOKEN = os.environ.get("AUTH_TOKEN")
 GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN")
 AI_PROVIDER = os.environ.get("AI_PROVIDER", "openai")
 
+# Linear issue key embedded in PR titles (e.g., LOR-123)
+_ISSUE_KEY_RE = re.compile(r"([A-Z]+-\d+)")
+
+# Static pieces of the /review response body
+_BODY_HEADER = "### 🤖 Lornu AI Code Review\n\n"
+_FEEDBACK_HEADER = "#### 📝 Detailed Feedback\n\n"
+_SEVERITY_EMOJI = {"error": "🔴", "warning": "🟡", "info": "ℹ️"}
+
 # Initialize clients
 reviewer = CodeReviewer(provider=AI_PROVIDER)
 
@@ -34,84 +44,117 @@ if not GITHUB_TOKEN:
     )
 gh_client = GitHubClient(token=GITHUB_TOKEN)
 
+# Shared pooled client for outbound notifications (Google Chat, Linear).
+# Created on startup so keep-alive connections are reused across reviews.
+notifier_client: Optional[httpx.AsyncClient] = None
+
+
+@app.on_event("startup")
+async def _open_notifier_client():
+    global notifier_client
+    notifier_client = httpx.AsyncClient(
+        timeout=10.0,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        http2=True
+    )
+
+
+@app.on_event("shutdown")
+async def _close_notifier_client():
+    global notifier_client
+    if notifier_client is not None:
+        await notifier_client.aclose()
+        notifier_client = None
+
+
+@app.on_event("shutdown")
+async def _close_reviewer():
+    await reviewer.close()
+
+
+async def _post_chat(client: httpx.AsyncClient, chat_payload: Dict[str, Any]):
+    """Send a message to the Google Chat team space."""
+    await client.post(
+        GOOGLE_CHAT_WEBHOOK,
+        content=orjson.dumps(chat_payload),
+        headers={"Content-Type": "application/json"}
+    )
+
+
+async def _post_linear(client: httpx.AsyncClient, issue_key: str, review_summary: str, pr_number: Any):
+    """Post a "Review Done" comment on the linked Linear issue."""
+    # Linear's commentCreate accepts either the internal UUID or the
+    # human-readable identifier (e.g. LOR-123) as issueId, so the
+    # issue lookup happens server-side in a single round-trip.
+    linear_query = """
+    mutation CreateComment($issueId: String!, $body: String!) {
+        commentCreate(input: { issueId: $issueId, body: $body }) {
+            success
+        }
+    }
+    """
+    variables = {
+        "issueId": issue_key,
+        "body": f"🤖 AI Agent has finished reviewing the linked PR (#{pr_number}). Summary: {review_summary}"
+    }
+    headers = {
+        "Authorization": LINEAR_API_KEY,
+        "Content-Type": "application/json"
+    }
+    comment_response = await client.post(
+        "https://api.linear.app/graphql",
+        content=orjson.dumps({"query": linear_query, "variables": variables}),
+        headers=headers
+    )
+    comment_response.raise_for_status()
+    comment_data = orjson.loads(comment_response.content)
+    if comment_data.get("errors"):
+        logger.error(f"Linear rejected comment for issue {issue_key}: {comment_data['errors']}")
+
+
 async def notify_stakeholders(pr: Dict[str, Any], review_summary: str):
     """
     Sends notifications to Google Chat and updates Linear issues.
     Translated from TypeScript requirement in Issue #283.
+    
+    Both notifications are independent and are sent concurrently; a failure
+    in one does not cancel the other.
     """
-    async with httpx.AsyncClient() as client:
-        # 1. GOOGLE CHAT: Send a high-level summary to the team space
-        if GOOGLE_CHAT_WEBHOOK:
-            chat_payload = {
-                "text": f"🤖 *AI Review Complete for PR #{pr.get('number')}*\n> {review_summary}\nView PR: {pr.get('html_url')}"
-            }
-            try:
-                await client.post(GOOGLE_CHAT_WEBHOOK, json=chat_payload)
-            except Exception as e:
-                logger.error(f"Error notifying Google Chat: {e}", exc_info=True)
-
-        # 2. LINEAR: Find the linked issue and post a "Review Done" comment
-        if LINEAR_API_KEY:
-            # Extract Issue ID (e.g., LOR-123) from PR title
-            title = pr.get("title", "")
-            match = re.search(r"([A-Z]+-\d+)", title)
-            if match:
-                issue_key = match.group(1)
-                
-                # First, resolve the human-readable issue key to Linear's internal database ID (UUID)
-                issue_id = None
-                issue_lookup_query = """
-                query IssueByKey($key: String!) {
-                    issue(key: $key) {
-                        id
-                    }
-                }
-                """
-                headers = {
-                    "Authorization": LINEAR_API_KEY,
-                    "Content-Type": "application/json"
-                }
-                
-                try:
-                    lookup_response = await client.post(
-                        "https://api.linear.app/graphql",
-                        json={"query": issue_lookup_query, "variables": {"key": issue_key}},
-                        headers=headers
-                    )
-                    lookup_response.raise_for_status()
-                    lookup_data = lookup_response.json()
-                    issue_node = (lookup_data.get("data") or {}).get("issue")
-                    issue_id = issue_node.get("id") if issue_node else None
-                except Exception as e:
-                    logger.error(f"Error looking up Linear issue ID for key {issue_key}: {e}", exc_info=True)
-
-                if issue_id:
-                    linear_query = """
-                    mutation CreateComment($issueId: String!, $body: String!) {
-                        commentCreate(input: { issueId: $issueId, body: $body }) {
-                            success
-                        }
-                    }
-                    """
-                    variables = {
-                        "issueId": issue_id,
-                        "body": f"🤖 AI Agent has finished reviewing the linked PR (#{pr.get('number')}). Summary: {review_summary}"
-                    }
-                    try:
-                        comment_response = await client.post(
-                            "https://api.linear.app/graphql",
-                            json={"query": linear_query, "variables": variables},
-                            headers=headers
-                        )
-                        comment_response.raise_for_status()
-                    except Exception as e:
-                        logger.error(f"Error notifying Linear: {e}", exc_info=True)
+    if notifier_client is None:
+        logger.warning("Notifier client is not initialized; skipping notifications")
+        return
+
+    tasks = []
+    targets = []
+
+    # 1. GOOGLE CHAT: Send a high-level summary to the team space
+    if GOOGLE_CHAT_WEBHOOK:
+        chat_payload = {
+            "text": f"🤖 *AI Review Complete for PR #{pr.get('number')}*\n> {review_summary}\nView PR: {pr.get('html_url')}"
+        }
+        tasks.append(_post_chat(notifier_client, chat_payload))
+        targets.append("Google Chat")
+
+    # 2. LINEAR: Find the linked issue and post a "Review Done" comment
+    if LINEAR_API_KEY:
+        # Extract Issue ID (e.g., LOR-123) from PR title
+        title = pr.get("title", "")
+        match = _ISSUE_KEY_RE.search(title)
+        if match:
+            tasks.append(_post_linear(notifier_client, match.group(1), review_summary, pr.get("number")))
+            targets.append("Linear")
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for target, result in zip(targets, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error notifying {target}: {result}", exc_info=result)
 
 
 @app.post("/review")
 async def review_pr(
     request: Request,
-    x_pr_number: Optional[int] = Header(None),
+    background_tasks: BackgroundTasks,
+    x_pr_number: Optional[str] = Header(None),
     x_pr_repository: Optional[str] = Header(None)
 ):
     # Verify Auth Token
@@ -129,40 +172,32 @@ async def review_pr(
     if not secrets.compare_digest(token, AUTH_TOKEN):
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-    # Read diff from body (HEAD logic: expect raw diff)
+    # Read diff from body (HEAD logic: expect raw diff). Kept as bytes; the
+    # reviewer decodes only the filtered slices it sends to the model.
     try:
-        diff_content = (await request.body()).decode("utf-8")
+        diff_content = await request.body()
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid request body")
     
     if not diff_content:
         raise HTTPException(status_code=400, detail="Empty diff provided")
 
-    # Fetch PR metadata if possible - check both Header and custom headers
+    # Fetch PR metadata if possible (X-PR-Number / X-PR-Repository headers)
     pr_title = "Unknown PR"
     pr_description = ""
     pr_url = ""
-    pr_number = x_pr_number
     pr_repository = x_pr_repository
-    
-    # Also check custom headers (from workflow)
-    if not pr_number:
-        pr_number = request.headers.get("X-PR-Number")
-        if pr_number:
-            try:
-                pr_number = int(pr_number)
-            except (ValueError, TypeError):
-                pr_number = None
-    
-    if not pr_repository:
-        pr_repository = request.headers.get("X-PR-Repository")
+    try:
+        pr_number = int(x_pr_number) if x_pr_number else None
+    except ValueError:
+        pr_number = None
     
     if pr_number and pr_repository:
         try:
             repo_parts = pr_repository.split("/")
             if len(repo_parts) == 2:
                 owner, repo = repo_parts
-                pr_data = await gh_client.get_pr_details(owner, repo, pr_number)
+                pr_data = await gh_client.get_pr_bundle(owner, repo, pr_number)
                 pr_title = pr_data.get("title", pr_title)
                 pr_description = pr_data.get("body", "")
                 pr_url = pr_data.get("html_url", "")
@@ -188,28 +223,33 @@ async def review_pr(
     comments = review_results.get("comments", [])
     
     # Format body
-    body = f"### 🤖 Lornu AI Code Review\n\n"
-    body += f"**Summary:** {summary}\n\n"
-    body += f"**Security Score:** `{security_score}/100` 🛡️\n\n"
+    parts: List[str] = [
+        _BODY_HEADER,
+        f"**Summary:** {summary}\n\n",
+        f"**Security Score:** `{security_score}/100` 🛡️\n\n"
+    ]
     
     if comments:
-        body += "#### 📝 Detailed Feedback\n\n"
+        parts.append(_FEEDBACK_HEADER)
         for comment in comments:
+            # Model output is untrusted: only look up string severities
             severity = comment.get("severity", "info")
-            emoji = "🔴" if severity == "error" else "🟡" if severity == "warning" else "ℹ️"
+            emoji = _SEVERITY_EMOJI.get(severity, "ℹ️") if isinstance(severity, str) else "ℹ️"
             # Handle both 'file' and 'path' keys, and 'message' and 'body' keys
             file_path = comment.get("path") or comment.get("file", "unknown")
             line_num = comment.get("line", "?")
             comment_text = comment.get("message") or comment.get("body", "No comment")
-            body += f"- {emoji} **{file_path}** (Line {line_num}): {comment_text}\n"
+            parts.append(f"- {emoji} **{file_path}** (Line {line_num}): {comment_text}\n")
+    
+    body = "".join(parts)
     
-    # Notify stakeholders
+    # Notify stakeholders after the response is sent (off the critical path)
     pr_details = {
-        "number": pr_number or x_pr_number,
+        "number": pr_number,
         "title": pr_title,
         "html_url": pr_url
     }
-    await notify_stakeholders(pr_details, summary)
+    background_tasks.add_task(notify_stakeholders, pr_details, summary)
     
     return {"body": body}
 
@@ -218,5 +258,8 @@ async def healthz():
     return {"status": "ok"}
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8080)
+    # uvloop has no Windows build; use the stdlib loop there
+    loop = "asyncio" if sys.platform == "win32" else "uvloop"
+    uvicorn.run(app, host="0.0.0.0", port=8080, loop=loop, http="httptools")
@@ -2,10 +2,66 @@
 GitHub API client for fetching PR diffs and posting review comments.
 """
 import os
-from typing import Dict, Any, List, Optional
+import copy
+import json
+import time
+import hashlib
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable, Collection
 import httpx
 
 
+# GraphQL query for PR metadata; the review path only needs title, body and url
+PR_METADATA_QUERY = """
+query($o: String!, $r: String!, $n: Int!) {
+  repository(owner: $o, name: $r) {
+    pullRequest(number: $n) {
+      title
+      body
+      url
+    }
+  }
+}
+"""
+
+# Same lookup plus head commit and the changed-file list
+PR_BUNDLE_QUERY = """
+query($o: String!, $r: String!, $n: Int!) {
+  repository(owner: $o, name: $r) {
+    pullRequest(number: $n) {
+      title
+      body
+      url
+      headRefOid
+      files(first: 100) {
+        nodes { path additions deletions }
+      }
+    }
+  }
+}
+"""
+
+# Pooled httpx clients shared by GitHubClient instances using the same token,
+# keyed by a hash of the token. Each entry carries its client's reference count.
+_SHARED_CLIENTS: Dict[str, Tuple[httpx.AsyncClient, int]] = {}
+
+# Maximum number of PR metadata entries kept in the TTL cache
+PR_CACHE_SIZE = 256
+
+# Maximum number of PR diffs kept for ETag revalidation
+DIFF_CACHE_SIZE = 128
+
+# Maximum aliased pullRequest lookups per batched GraphQL request
+PR_BATCH_SIZE = 50
+
+# Fields selected per aliased PR in batched detail lookups
+PR_DETAILS_FIELDS = (
+    "number title body url state merged createdAt updatedAt "
+    "headRefName headRefOid baseRefName author { login }"
+)
+
+
 class GitHubClient:
     """Client for interacting with GitHub API."""
     
@@ -27,12 +83,149 @@ class GitHubClient:
             "Accept": "application/vnd.github.v3+json",
             "User-Agent": "Lornu-AI-PR-Reviewer/1.0"
         }
-        self.client = httpx.AsyncClient(base_url=self.base_url, headers=self.headers)
+        
+        # Reuse one connection pool per token across instances
+        self._client_key = hashlib.blake2s(self.token.encode("utf-8")).hexdigest()
+        client, refs = _SHARED_CLIENTS.get(self._client_key, (None, 0))
+        if client is None or client.is_closed:
+            # Instances still holding a replaced client no longer count against this one
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=20)
+            )
+            refs = 0
+        _SHARED_CLIENTS[self._client_key] = (client, refs + 1)
+        self.client = client
+        self._closed = False
+        
+        # TTL + LRU cache for PR metadata, keyed by (kind, owner, repo, pull_number)
+        self._pr_cache: "OrderedDict[Tuple[Any, ...], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # Short enough that a re-review after editing the PR title (e.g. to add
+        # a Linear key) sees the new title; long enough to absorb redeliveries
+        self._pr_cache_ttl = 30
+        # Per-key fetch lock and the number of callers currently holding or awaiting it
+        self._pr_cache_locks: Dict[Tuple[Any, ...], Tuple[asyncio.Lock, int]] = {}
+        
+        # LRU of (etag, diff_text) keyed by (owner, repo, pull_number)
+        self._diff_cache: "OrderedDict[Tuple[str, str, int], Tuple[str, str]]" = OrderedDict()
     
     async def close(self):
-        """Close the underlying httpx client."""
+        """
+        Release the shared httpx client.
+        
+        The underlying client is only closed once every GitHubClient using
+        the same token has been closed.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        
+        client, refs = _SHARED_CLIENTS.get(self._client_key, (None, 0))
+        if client is self.client:
+            if refs > 1:
+                _SHARED_CLIENTS[self._client_key] = (client, refs - 1)
+                return
+            del _SHARED_CLIENTS[self._client_key]
+        # Either the last user of the shared client, or holding a client that
+        # was already replaced; never touch another client's count
         await self.client.aclose()
     
+    def clear_pr_cache(self):
+        """Drop all cached PR details and diffs."""
+        self._pr_cache.clear()
+        self._diff_cache.clear()
+    
+    def _cache_get(self, key: Tuple[Any, ...]) -> Optional[Dict[str, Any]]:
+        """Return a copy of a fresh cache entry, dropping it if expired."""
+        cached = self._pr_cache.get(key)
+        if cached is None:
+            return None
+        if time.monotonic() - cached[0] >= self._pr_cache_ttl:
+            del self._pr_cache[key]
+            return None
+        self._pr_cache.move_to_end(key)
+        return copy.deepcopy(cached[1])
+    
+    def _cache_put(self, key: Tuple[Any, ...], data: Dict[str, Any]):
+        """Store an entry, evicting the least recently used beyond PR_CACHE_SIZE."""
+        self._pr_cache[key] = (time.monotonic(), data)
+        self._pr_cache.move_to_end(key)
+        while len(self._pr_cache) > PR_CACHE_SIZE:
+            self._pr_cache.popitem(last=False)
+    
+    async def _get_cached(
+        self,
+        key: Tuple[Any, ...],
+        fetch: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Return a cached value for key, calling fetch on miss or expiry.
+        
+        Concurrent callers for the same key share a single in-flight fetch.
+        Callers receive a copy, so mutating the result never touches the cache.
+        """
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        
+        lock, users = self._pr_cache_locks.get(key, (asyncio.Lock(), 0))
+        self._pr_cache_locks[key] = (lock, users + 1)
+        try:
+            async with lock:
+                # Another caller may have populated the cache while we waited
+                cached = self._cache_get(key)
+                if cached is not None:
+                    return cached
+                
+                data = await fetch()
+                self._cache_put(key, data)
+                return copy.deepcopy(data)
+        finally:
+            # Drop the lock once nobody holds or awaits it, even after a failed
+            # fetch, so later callers keep serialising on the same lock until then
+            _, users = self._pr_cache_locks[key]
+            if users > 1:
+                self._pr_cache_locks[key] = (lock, users - 1)
+            else:
+                del self._pr_cache_locks[key]
+    
+    async def graphql(
+        self,
+        query: str,
+        variables: Optional[Dict[str, Any]] = None,
+        ignore_errors_at: Optional[Collection[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Execute a GitHub GraphQL v4 query.
+        
+        Args:
+            query: GraphQL document
+            variables: Query variables
+            ignore_errors_at: Top-level response fields (e.g. aliases) whose
+                errors are tolerated, returning partial data for the rest
+            
+        Returns:
+            The "data" object of the response
+        
+        Raises:
+            RuntimeError: If GitHub returns GraphQL errors outside ignore_errors_at
+        """
+        response = await self.client.post(
+            "/graphql",
+            json={"query": query, "variables": variables or {}}
+        )
+        response.raise_for_status()
+        payload = response.json()
+        errors = [
+            error for error in payload.get("errors") or []
+            if not (ignore_errors_at and (error.get("path") or [None])[0] in ignore_errors_at)
+        ]
+        if errors:
+            raise RuntimeError(f"GitHub GraphQL error: {errors}")
+        return payload.get("data") or {}
+    
     async def get_pr_diff(
         self,
         owner: str,
@@ -42,6 +235,10 @@ class GitHubClient:
         """
         Fetch PR diff from GitHub API.
         
+        Previously fetched diffs are revalidated with If-None-Match; a 304
+        response (which does not count against the rate limit) returns the
+        cached text.
+        
         Args:
             owner: Repository owner (e.g., "lornu-ai")
             repo: Repository name (e.g., "private-lornu-ai")
@@ -50,12 +247,28 @@ class GitHubClient:
         Returns:
             PR diff as string
         """
+        key = (owner, repo, pull_number)
+        cached = self._diff_cache.get(key)
+        headers = {"Accept": "application/vnd.github.v3.diff"}
+        if cached:
+            headers["If-None-Match"] = cached[0]
+        
         # Fetch PR diff
         response = await self.client.get(
             f"/repos/{owner}/{repo}/pulls/{pull_number}",
-            headers={"Accept": "application/vnd.github.v3.diff"}
+            headers=headers
         )
+        if cached and response.status_code == 304:
+            self._diff_cache.move_to_end(key)
+            return cached[1]
         response.raise_for_status()
+        
+        etag = response.headers.get("ETag")
+        if etag:
+            self._diff_cache[key] = (etag, response.text)
+            self._diff_cache.move_to_end(key)
+            while len(self._diff_cache) > DIFF_CACHE_SIZE:
+                self._diff_cache.popitem(last=False)
         return response.text
     
     async def get_pr_patch(
@@ -164,6 +377,82 @@ class GitHubClient:
         response.raise_for_status()
         return response.json()
     
+    async def _fetch_pr_details(
+        self,
+        prs: List[Tuple[str, str, int]]
+    ) -> Dict[Tuple[str, str, int], Dict[str, Any]]:
+        """
+        Fetch details for many PRs with aliased GraphQL lookups.
+        
+        Issues one request per PR_BATCH_SIZE PRs. PRs that cannot be
+        resolved are omitted from the result; any other GraphQL error
+        (rate limits, missing scopes, bad queries) is raised.
+        """
+        results: Dict[Tuple[str, str, int], Dict[str, Any]] = {}
+        for offset in range(0, len(prs), PR_BATCH_SIZE):
+            batch = prs[offset:offset + PR_BATCH_SIZE]
+            fields = "\n".join(
+                f"pr_{i}: repository(owner: {json.dumps(owner)}, name: {json.dumps(repo)}) "
+                f"{{ pullRequest(number: {int(number)}) {{ {PR_DETAILS_FIELDS} }} }}"
+                for i, (owner, repo, number) in enumerate(batch)
+            )
+            aliases = {f"pr_{i}" for i in range(len(batch))}
+            data = await self.graphql(f"query {{\n{fields}\n}}", ignore_errors_at=aliases)
+            for i, (owner, repo, number) in enumerate(batch):
+                pr = (data.get(f"pr_{i}") or {}).get("pullRequest")
+                if pr:
+                    results[(owner, repo, number)] = self._rest_pr_fields(pr)
+        return results
+    
+    @staticmethod
+    def _rest_pr_fields(pr: Dict[str, Any]) -> Dict[str, Any]:
+        """Map a GraphQL pullRequest node onto the REST pull request field names."""
+        state = (pr.get("state") or "").lower()
+        return {
+            "number": pr.get("number"),
+            "title": pr.get("title", ""),
+            "body": pr.get("body") or "",
+            "html_url": pr.get("url", ""),
+            "state": "closed" if state == "merged" else state,
+            "merged": bool(pr.get("merged")),
+            "created_at": pr.get("createdAt"),
+            "updated_at": pr.get("updatedAt"),
+            "user": {"login": (pr.get("author") or {}).get("login")},
+            "head": {"ref": pr.get("headRefName"), "sha": pr.get("headRefOid")},
+            "base": {"ref": pr.get("baseRefName")}
+        }
+    
+    async def get_pr_details_batch(
+        self,
+        repo_to_numbers: Dict[Tuple[str, str], List[int]]
+    ) -> Dict[Tuple[str, str, int], Dict[str, Any]]:
+        """
+        Get details for many PRs, batching uncached ones into GraphQL requests.
+        
+        Args:
+            repo_to_numbers: Mapping of (owner, repo) to PR numbers
+            
+        Returns:
+            Mapping of (owner, repo, pull_number) to PR data in the same shape
+            as get_pr_details. PRs that could not be resolved are omitted.
+        """
+        results: Dict[Tuple[str, str, int], Dict[str, Any]] = {}
+        missing: List[Tuple[str, str, int]] = []
+        for (owner, repo), numbers in repo_to_numbers.items():
+            for number in numbers:
+                cached = self._cache_get(("details", owner, repo, number))
+                if cached is not None:
+                    results[(owner, repo, number)] = cached
+                else:
+                    missing.append((owner, repo, number))
+        
+        if missing:
+            fetched = await self._fetch_pr_details(missing)
+            for (owner, repo, number), data in fetched.items():
+                self._cache_put(("details", owner, repo, number), copy.deepcopy(data))
+            results.update(fetched)
+        return results
+    
     async def get_pr_details(
         self,
         owner: str,
@@ -173,16 +462,81 @@ class GitHubClient:
         """
         Get PR details.
         
+        Thin wrapper over the batched GraphQL lookup. Results are cached for
+        ``_pr_cache_ttl`` seconds; concurrent callers for the same PR share a
+        single in-flight request.
+        
         Args:
             owner: Repository owner
             repo: Repository name
             pull_number: PR number
             
         Returns:
-            PR data
+            PR data using REST field names, limited to: number, title, body,
+            html_url, state, merged, created_at, updated_at, user.login,
+            head.ref, head.sha and base.ref. Note: this used to be the full
+            REST payload; other REST fields are no longer present.
+        
+        Raises:
+            RuntimeError: If the PR cannot be found, or on other GraphQL errors
         """
-        response = await self.client.get(
-            f"/repos/{owner}/{repo}/pulls/{pull_number}"
-        )
-        response.raise_for_status()
-        return response.json()
+        async def fetch() -> Dict[str, Any]:
+            key = (owner, repo, pull_number)
+            data = (await self._fetch_pr_details([key])).get(key)
+            if data is None:
+                raise RuntimeError(f"Pull request {owner}/{repo}#{pull_number} not found")
+            return data
+        
+        return await self._get_cached(("details", owner, repo, pull_number), fetch)
+    
+    async def get_pr_bundle(
+        self,
+        owner: str,
+        repo: str,
+        pull_number: int,
+        include_files: bool = False,
+        include_diff: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Get PR metadata (and optionally changed files) in a single GraphQL request.
+        
+        Replaces separate REST calls for details and file listings. Key names
+        follow the REST payload where one exists, but only the keys listed
+        under Returns are present (no state, merged, user, head or base; use
+        get_pr_details for those). Results use the same cache storage and TTL
+        as get_pr_details, under separate "metadata"/"bundle" keys.
+        
+        Args:
+            owner: Repository owner
+            repo: Repository name
+            pull_number: PR number
+            include_files: Also fetch the head commit SHA and changed files
+            include_diff: Also fetch the unified diff via the REST diff media type
+            
+        Returns:
+            Dict with number, title, body and html_url; plus head_sha and
+            files (list of {path, additions, deletions}) if include_files,
+            and diff if include_diff
+        """
+        async def fetch() -> Dict[str, Any]:
+            data = await self.graphql(
+                PR_BUNDLE_QUERY if include_files else PR_METADATA_QUERY,
+                {"o": owner, "r": repo, "n": pull_number}
+            )
+            pr = ((data.get("repository") or {}).get("pullRequest")) or {}
+            bundle = {
+                "number": pull_number,
+                "title": pr.get("title", ""),
+                "body": pr.get("body") or "",
+                "html_url": pr.get("url", "")
+            }
+            if include_files:
+                bundle["head_sha"] = pr.get("headRefOid")
+                bundle["files"] = (pr.get("files") or {}).get("nodes") or []
+            return bundle
+        
+        kind = "bundle" if include_files else "metadata"
+        bundle = await self._get_cached((kind, owner, repo, pull_number), fetch)
+        if include_diff:
+            bundle = {**bundle, "diff": await self.get_pr_diff(owner, repo, pull_number)}
+        return bundle
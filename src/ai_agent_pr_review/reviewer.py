@@ -3,20 +3,129 @@ AI-powered code review logic.
 """
 import os
 import re
-import json
+import random
+import asyncio
 import fnmatch
-from typing import Dict, Any, List, Optional
-from openai import AsyncOpenAI
-from anthropic import AsyncAnthropic
+from typing import Dict, Any, List, Optional, Union
+import httpx
+import orjson
+
+# Patterns for extracting JSON from Claude responses
+_JSON_FENCE_RE = re.compile(r'```(?:json)?\s*(\{.*\})\s*```', re.DOTALL)
+_JSON_OBJ_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+# Start of each file section: git headers, or "---"/"+++" pairs for plain unified diffs.
+# Only header lines are matched; sections are sliced between consecutive offsets.
+_GIT_HEADER_RE = re.compile(rb'^diff --git ', re.MULTILINE)
+_UNIFIED_HEADER_RE = re.compile(rb'^--- [^\n]*\n\+\+\+ ', re.MULTILINE)
+
+# Files that are never worth sending to the model (generated, vendored, assets)
+DEFAULT_EXCLUDE_PATTERNS = [
+    "*.lock",
+    "*.svg",
+    "*.min.*",
+    "dist/*",
+    "*/dist/*",
+    "node_modules/*",
+    "*/node_modules/*",
+    "vendor/*",
+    "*/vendor/*",
+]
+
+# Per-file line budget before a file section is truncated
+DEFAULT_MAX_LINES_PER_FILE = 500
+
+TRUNCATION_MARKER = b"... [truncated]\n"
+
+OPENAI_DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+# Retry policy for direct OpenAI calls, mirroring the SDK defaults
+OPENAI_MAX_RETRIES = 2
+OPENAI_RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+OPENAI_MAX_RETRY_DELAY = 8.0
+
+
+# C-style escapes git uses in quoted paths (core.quotePath), e.g. "b/caf\303\251.py"
+_QUOTED_ESCAPE_RE = re.compile(rb'\\([0-7]{3}|.)', re.DOTALL)
+_QUOTED_ESCAPES = {
+    b"a": b"\a", b"b": b"\b", b"t": b"\t", b"n": b"\n",
+    b"v": b"\v", b"f": b"\f", b"r": b"\r",
+}
+# One path token on a "diff --git" line: quoted or bare
+_GIT_PATH_TOKEN_RE = re.compile(rb'"(?:[^"\\]|\\.)*"|\S+')
+
+
+def _unquote_path(path: bytes) -> bytes:
+    """Undo git's quoting of paths with special or non-ASCII characters."""
+    if len(path) < 2 or not (path.startswith(b'"') and path.endswith(b'"')):
+        return path
+    
+    def unescape(m: "re.Match[bytes]") -> bytes:
+        esc = m.group(1)
+        if len(esc) == 3:
+            return bytes([int(esc, 8) & 0xFF])
+        return _QUOTED_ESCAPES.get(esc, esc)
+    
+    return _QUOTED_ESCAPE_RE.sub(unescape, path[1:-1])
+
+
+def _section_path(header: bytes) -> str:
+    """
+    Extract the file path from the header lines of one diff file section.
+    
+    Prefers the "+++ b/" line (falling back to "--- a/" for deletions), which
+    is unambiguous even when a path contains " b/". Sections without those
+    lines (binary files, mode changes) fall back to the "diff --git" line.
+    Paths quoted by git are unquoted before the a/ or b/ prefix is removed.
+    """
+    new_path = old_path = None
+    for line in header.split(b"\n"):
+        if line.startswith(b"+++ "):
+            new_path = line[4:]
+        elif line.startswith(b"--- "):
+            old_path = line[4:]
+    
+    for path, prefix in ((new_path, b"b/"), (old_path, b"a/")):
+        if path is None:
+            continue
+        # Plain unified diffs may append a tab-separated timestamp
+        path = _unquote_path(path.partition(b"\t")[0].strip())
+        if path == b"/dev/null":
+            continue
+        if path.startswith(prefix):
+            path = path[2:]
+        return path.decode("utf-8", errors="replace")
+    
+    # "diff --git a/<p> b/<p>": both paths are equal unless renamed
+    first_line = header.partition(b"\n")[0]
+    if not first_line.startswith(b"diff --git "):
+        return ""
+    rest = first_line[len(b"diff --git "):].strip()
+    if rest.startswith(b'"') or rest.endswith(b'"'):
+        tokens = _GIT_PATH_TOKEN_RE.findall(rest)
+        path = _unquote_path(tokens[-1]) if tokens else b""
+        if path.startswith(b"b/"):
+            path = path[2:]
+        return path.decode("utf-8", errors="replace")
+    half = (len(rest) - 5) // 2
+    if half > 0 and rest == b"a/" + rest[2:2 + half] + b" b/" + rest[2:2 + half]:
+        return rest[2:2 + half].decode("utf-8", errors="replace")
+    _, sep, path = rest.rpartition(b" b/")
+    return path.decode("utf-8", errors="replace") if sep else ""
 
 
 class CodeReviewer:
-    """AI-powered code reviewer using OpenAI or Claude."""
+    """
+    AI-powered code reviewer using OpenAI or Claude.
+    
+    Only the SDK for the configured provider is imported, on construction.
+    """
     
     def __init__(
         self,
         provider: str = "openai",
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        use_sdk: Optional[bool] = None
     ):
         """
         Initialize code reviewer.
@@ -24,23 +133,105 @@ class CodeReviewer:
         Args:
             provider: AI provider ("openai" or "claude")
             model: Model name (defaults based on provider)
+            use_sdk: For OpenAI, go through the official SDK instead of posting
+                     directly with a pooled httpx client. Defaults to the
+                     OPENAI_USE_SDK environment variable. The direct path
+                     honours OPENAI_BASE_URL / OPENAI_ORG_ID / OPENAI_PROJECT_ID
+                     and retries 408/409/429/5xx and connection errors like
+                     the SDK does.
         """
         self.provider = provider.lower()
+        self.client = None
+        self._http: Optional[httpx.AsyncClient] = None
         
         if self.provider == "openai":
             api_key = os.getenv("OPENAI_API_KEY")
             if not api_key:
                 raise ValueError("OPENAI_API_KEY environment variable is required")
-            self.client = AsyncOpenAI(api_key=api_key)
+            if use_sdk is None:
+                use_sdk = os.getenv("OPENAI_USE_SDK", "").lower() in ("1", "true", "yes")
+            if use_sdk:
+                from openai import AsyncOpenAI
+                self.client = AsyncOpenAI(api_key=api_key)
+            else:
+                base_url = os.getenv("OPENAI_BASE_URL") or OPENAI_DEFAULT_BASE_URL
+                self._openai_url = f"{base_url.rstrip('/')}/chat/completions"
+                self._openai_headers = {
+                    "Authorization": f"Bearer {api_key}",
+                    "Content-Type": "application/json"
+                }
+                if os.getenv("OPENAI_ORG_ID"):
+                    self._openai_headers["OpenAI-Organization"] = os.getenv("OPENAI_ORG_ID")
+                if os.getenv("OPENAI_PROJECT_ID"):
+                    self._openai_headers["OpenAI-Project"] = os.getenv("OPENAI_PROJECT_ID")
+                self._http = httpx.AsyncClient(
+                    timeout=httpx.Timeout(600.0, connect=10.0),
+                    limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+                )
             self.model = model or os.getenv("OPENAI_MODEL", "gpt-4o")
         elif self.provider == "claude":
             api_key = os.getenv("ANTHROPIC_API_KEY")
             if not api_key:
                 raise ValueError("ANTHROPIC_API_KEY environment variable is required")
+            from anthropic import AsyncAnthropic
             self.client = AsyncAnthropic(api_key=api_key)
             self.model = model or os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-20241022")
         else:
             raise ValueError(f"Unsupported provider: {provider}")
+        
+        # The system prompt has no per-review state; build it once
+        self._system_prompt = self._build_system_prompt()
+    
+    async def close(self):
+        """Close the pooled httpx client, if any."""
+        if self._http is not None:
+            await self._http.aclose()
+    
+    async def _call_openai(self, payload: bytes) -> bytes:
+        """
+        POST a pre-serialized Chat Completions request to OpenAI.
+        
+        Retries up to OPENAI_MAX_RETRIES times on retryable statuses and
+        connection errors, with exponential backoff (or Retry-After).
+        
+        Args:
+            payload: JSON request body
+            
+        Returns:
+            Raw JSON response body
+        """
+        for attempt in range(OPENAI_MAX_RETRIES + 1):
+            last_attempt = attempt == OPENAI_MAX_RETRIES
+            try:
+                response = await self._http.post(
+                    self._openai_url,
+                    content=payload,
+                    headers=self._openai_headers
+                )
+            except httpx.TransportError:
+                if last_attempt:
+                    raise
+                await asyncio.sleep(self._retry_delay(attempt, None))
+                continue
+            
+            if response.status_code in OPENAI_RETRY_STATUSES and not last_attempt:
+                await asyncio.sleep(self._retry_delay(attempt, response))
+                continue
+            response.raise_for_status()
+            return response.content
+    
+    @staticmethod
+    def _retry_delay(attempt: int, response: Optional[httpx.Response]) -> float:
+        """Seconds to wait before retry number attempt + 1."""
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("Retry-After", ""))
+                if 0 <= retry_after <= 60:
+                    return retry_after
+            except ValueError:
+                pass
+        delay = min(0.5 * 2 ** attempt, OPENAI_MAX_RETRY_DELAY)
+        return delay * (1 - 0.25 * random.random())
     
     def _build_system_prompt(self) -> str:
         """Build system prompt for code review."""
@@ -83,27 +274,38 @@ Use 'severity' to indicate issue level: 'error' (critical), 'warning' (should fi
     
     async def review_diff(
         self,
-        diff: str,
+        diff: Union[bytes, str],
         pr_title: str,
         pr_description: Optional[str] = None,
         max_files: Optional[int] = None,
-        exclude_patterns: Optional[List[str]] = None
+        exclude_patterns: Optional[List[str]] = None,
+        max_lines_per_file: Optional[int] = DEFAULT_MAX_LINES_PER_FILE,
+        use_default_excludes: bool = True
     ) -> Dict[str, Any]:
         """
         Review code diff using AI.
         
         Args:
-            diff: PR diff string
+            diff: PR diff, ideally raw bytes (str is encoded to UTF-8)
             pr_title: PR title
             pr_description: PR description/body
             max_files: Maximum number of files to review (None = all)
             exclude_patterns: File patterns to exclude (e.g., ["*.lock", "dist/*"])
+            max_lines_per_file: Truncate each file's diff after this many lines (None = no limit)
+            use_default_excludes: Also apply DEFAULT_EXCLUDE_PATTERNS
             
         Returns:
             Review results with summary, security score, and comments
         """
-        # Filter diff if needed
-        filtered_diff = self._filter_diff(diff, exclude_patterns, max_files)
+        # Trim the diff before it reaches the prompt: input tokens dominate cost and latency
+        if use_default_excludes:
+            exclude_patterns = DEFAULT_EXCLUDE_PATTERNS + (exclude_patterns or [])
+        if isinstance(diff, str):
+            diff = diff.encode("utf-8")
+        # Only the bytes that survive filtering are decoded for the prompt
+        filtered_diff = self._filter_diff(
+            diff, exclude_patterns, max_files, max_lines_per_file
+        ).decode("utf-8", errors="replace")
         
         # Build prompt
         user_prompt = f"""Review this pull request:
@@ -116,20 +318,31 @@ Diff:
 
 Provide a comprehensive code review focusing on security, logic, performance, and maintainability."""
         
-        system_prompt = self._build_system_prompt()
+        system_prompt = self._system_prompt
         
         # Call AI
         if self.provider == "openai":
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.3
-            )
-            result_text = response.choices[0].message.content
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
+            if self._http is not None:
+                payload = orjson.dumps({
+                    "model": self.model,
+                    "messages": messages,
+                    "response_format": {"type": "json_object"},
+                    "temperature": 0.3
+                })
+                completion = orjson.loads(await self._call_openai(payload))
+                result_text = completion["choices"][0]["message"]["content"]
+            else:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    response_format={"type": "json_object"},
+                    temperature=0.3
+                )
+                result_text = response.choices[0].message.content
         else:  # Claude
             # Claude doesn't support structured output like OpenAI, so we request JSON in the prompt
             json_prompt = f"{user_prompt}\n\nIMPORTANT: Respond with valid JSON only. Use this exact format:\n{{\n  \"summary\": \"review summary\",\n  \"security_score\": 85,\n  \"comments\": [{{\"path\": \"file.py\", \"line\": 42, \"message\": \"comment\", \"severity\": \"warning\"}}]\n}}"
@@ -143,19 +356,19 @@ Provide a comprehensive code review focusing on security, logic, performance, an
             )
             result_text = response.content[0].text
             # Extract JSON from response if it's wrapped in markdown code blocks
-            json_match = re.search(r'```(?:json)?\s*(\{.*\})\s*```', result_text, re.DOTALL)
+            json_match = _JSON_FENCE_RE.search(result_text)
             if json_match:
                 result_text = json_match.group(1)
             else:
                 # Try to find JSON object directly
-                json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
+                json_match = _JSON_OBJ_RE.search(result_text)
                 if json_match:
                     result_text = json_match.group(0)
         
         # Parse JSON response
         try:
-            result = json.loads(result_text)
-        except json.JSONDecodeError:
+            result = orjson.loads(result_text)
+        except orjson.JSONDecodeError:
             # Fallback if AI doesn't return valid JSON
             result = {
                 "summary": result_text[:500],
@@ -167,51 +380,103 @@ Provide a comprehensive code review focusing on security, logic, performance, an
     
     def _filter_diff(
         self,
-        diff: str,
+        diff: bytes,
         exclude_patterns: Optional[List[str]],
-        max_files: Optional[int]
-    ) -> str:
+        max_files: Optional[int],
+        max_lines_per_file: Optional[int] = None
+    ) -> bytes:
         """
         Filter diff based on exclude patterns and max files.
         
+        Works on raw bytes so large diffs are never fully decoded; only file
+        header lines are decoded for pattern matching. Binary file sections
+        are always dropped, and hunk bodies longer than max_lines_per_file
+        (counted after the file headers and first "@@" line) are cut short
+        with a truncation marker.
+        
         Args:
-            diff: Original diff
+            diff: Original diff (raw bytes)
             exclude_patterns: Patterns to exclude
             max_files: Maximum number of files
+            max_lines_per_file: Maximum hunk-body lines kept per file
             
         Returns:
-            Filtered diff
+            Filtered diff (raw bytes); the original object if nothing was dropped
         """
-        if not exclude_patterns and not max_files:
+        # Nothing to do: no filters and no binary sections to drop
+        if (
+            not exclude_patterns and not max_files and not max_lines_per_file
+            and b"\nBinary files " not in diff and b"\nGIT binary patch" not in diff
+        ):
+            return diff
+        
+        # Translate all globs once into a single alternation (fnmatchcase semantics)
+        exclude_re = None
+        if exclude_patterns:
+            exclude_re = re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in exclude_patterns))
+        
+        # Locate file sections by their header offsets only
+        offsets = [m.start() for m in _GIT_HEADER_RE.finditer(diff)]
+        if not offsets:
+            offsets = [m.start() for m in _UNIFIED_HEADER_RE.finditer(diff)]
+        if not offsets:
+            # No file headers at all; nothing to filter on
             return diff
+        offsets.append(len(diff))
         
-        lines = diff.split("\n")
-        filtered_lines = []
-        current_file = None
+        # Kept sections are zero-copy views into diff; bytes are only copied
+        # by the final join, which is skipped when nothing was dropped
+        view = memoryview(diff)
+        chunks = [view[:offsets[0]]]
         file_count = 0
+        any_excluded = False
         
-        for line in lines:
-            # Check if this is a file header
-            if line.startswith("diff --git") or line.startswith("--- a/") or line.startswith("+++ b/"):
-                # Extract filename
-                if line.startswith("+++ b/"):
-                    # More robust parsing: everything after "+++ b/"
-                    filename = line[6:].strip()
-                    
-                    # Check exclude patterns
-                    if exclude_patterns:
-                        if any(fnmatch.fnmatch(filename, pattern) for pattern in exclude_patterns):
-                            current_file = None
-                            continue
-                    
-                    # Check max files
-                    if max_files and file_count >= max_files:
+        for start, end in zip(offsets, offsets[1:]):
+            # Header lines run up to the first hunk
+            hunk_start = diff.find(b"\n@@", start, end)
+            header_end = end if hunk_start == -1 else hunk_start
+            filename = _section_path(diff[start:header_end])
+            
+            # Check exclude patterns
+            if exclude_re and exclude_re.match(filename):
+                any_excluded = True
+                continue
+            
+            # Binary files carry no reviewable text
+            if (
+                diff.find(b"\nBinary files ", start, header_end) != -1
+                or diff.find(b"\nGIT binary patch", start, header_end) != -1
+            ):
+                any_excluded = True
+                continue
+            
+            # Check max files
+            if max_files and file_count >= max_files:
+                any_excluded = True
+                break
+            
+            # Truncate oversized hunk bodies; the budget starts after the
+            # file headers and the first "@@" line, so some content survives
+            cut = end
+            if max_lines_per_file and hunk_start != -1:
+                cut = diff.find(b"\n", hunk_start + 1, end) + 1
+                # Walk to the end of the Nth body line without copying the section
+                for _ in range(max_lines_per_file):
+                    if cut <= 0 or cut >= end:
                         break
-                    
-                    file_count += 1
-                    current_file = filename
+                    cut = diff.find(b"\n", cut, end) + 1
+                if cut <= 0:
+                    cut = end
+            if cut < end:
+                chunks.append(diff[start:cut] + TRUNCATION_MARKER)
+                any_excluded = True
+            else:
+                chunks.append(view[start:end])
             
-            if current_file is not None:
-                filtered_lines.append(line)
+            file_count += 1
+        
+        if not any_excluded:
+            # Every file kept intact: skip the rejoin
+            return diff
         
-        return "\n".join(filtered_lines)
+        return b"".join(chunks)
@@ -2,23 +2,25 @@
 GitHub Webhook signature validation and payload parsing.
 """
 import hmac
-import hashlib
-from typing import Optional
+from typing import Optional, Union
 from fastapi import Request, HTTPException
 
 
 def verify_github_signature(
     payload_body: bytes,
     signature_header: Optional[str],
-    secret: str
+    secret: Union[str, bytes]
 ) -> bool:
     """
     Verify GitHub webhook signature using HMAC SHA-256.
     
+    Uses the one-shot ``hmac.digest`` C path (OpenSSL) rather than building
+    an ``hmac.HMAC`` object.
+    
     Args:
         payload_body: Raw request body bytes
         signature_header: X-Hub-Signature-256 header value (format: sha256=<hash>)
-        secret: GitHub webhook secret
+        secret: GitHub webhook secret (pass bytes to skip re-encoding per call)
         
     Returns:
         True if signature is valid, False otherwise
@@ -33,11 +35,8 @@ def verify_github_signature(
     expected_hash = signature_header[7:]  # Remove "sha256=" prefix
     
     # Compute HMAC SHA-256
-    computed_hash = hmac.new(
-        secret.encode("utf-8"),
-        payload_body,
-        hashlib.sha256
-    ).hexdigest()
+    key = secret.encode("utf-8") if isinstance(secret, str) else secret
+    computed_hash = hmac.digest(key, payload_body, "sha256").hex()
     
     # Constant-time comparison to prevent timing attacks
     return hmac.compare_digest(computed_hash, expected_hash)
@@ -46,7 +45,7 @@ def verify_github_signature(
 def validate_webhook_request(
     request: Request,
     payload_body: bytes,
-    webhook_secret: str
+    webhook_secret: Union[str, bytes]
 ) -> bool:
     """
     Validate GitHub webhook request signature.
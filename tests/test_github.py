@@ -0,0 +1,235 @@
+"""
+Tests for GitHubClient GraphQL lookups and caching.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from ai_agent_pr_review import github as github_module
+from ai_agent_pr_review.github import GitHubClient
+
+
+def _pr_node(number: int, title: str) -> dict:
+    return {
+        "number": number,
+        "title": title,
+        "body": None,
+        "url": f"https://github.com/o/r/pull/{number}",
+        "state": "MERGED",
+        "merged": True,
+        "createdAt": "2026-01-01T00:00:00Z",
+        "updatedAt": "2026-01-02T00:00:00Z",
+        "headRefName": "feature",
+        "headRefOid": "abc123",
+        "baseRefName": "main",
+        "author": {"login": "octocat"},
+    }
+
+
+@pytest.fixture
+def github():
+    """GitHubClient whose HTTP traffic is answered by the replies list (JSON or Responses)."""
+    client = GitHubClient(token="test-token")
+    client.replies = []
+    client.requests = []
+    
+    def handler(request):
+        client.requests.append(request)
+        reply = client.replies.pop(0)
+        if isinstance(reply, httpx.Response):
+            return reply
+        return httpx.Response(200, json=reply)
+    
+    shared = client.client
+    client.client = httpx.AsyncClient(
+        base_url=client.base_url,
+        transport=httpx.MockTransport(handler)
+    )
+    yield client
+    
+    # Release the real shared client so it does not outlive the test
+    mock, client.client = client.client, shared
+    asyncio.run(mock.aclose())
+    asyncio.run(client.close())
+
+
+def test_batch_omits_unresolvable_prs(github):
+    github.replies.append({
+        "data": {"pr_0": {"pullRequest": _pr_node(1, "LOR-1 fix")}, "pr_1": {"pullRequest": None}},
+        "errors": [{"type": "NOT_FOUND", "path": ["pr_1", "pullRequest"]}],
+    })
+    
+    result = asyncio.run(github.get_pr_details_batch({("o", "r"): [1, 2]}))
+    
+    assert list(result) == [("o", "r", 1)]
+    pr = result[("o", "r", 1)]
+    assert pr["title"] == "LOR-1 fix"
+    assert pr["body"] == ""
+    assert pr["state"] == "closed"
+    assert pr["head"]["sha"] == "abc123"
+    assert pr["user"]["login"] == "octocat"
+
+
+def test_batch_raises_top_level_errors(github):
+    github.replies.append({
+        "data": None,
+        "errors": [{"type": "RATE_LIMITED", "message": "API rate limit exceeded"}],
+    })
+    
+    with pytest.raises(RuntimeError, match="rate limit"):
+        asyncio.run(github.get_pr_details("o", "r", 1))
+
+
+def test_batch_aliases_each_pr(github):
+    github.replies.append({"data": {
+        "pr_0": {"pullRequest": _pr_node(1, "a")},
+        "pr_1": {"pullRequest": _pr_node(7, "b")},
+    }})
+    
+    asyncio.run(github.get_pr_details_batch({("o", "r"): [1], ("o", "other"): [7]}))
+    
+    query = json.loads(github.requests[0].content)["query"]
+    assert 'pr_0: repository(owner: "o", name: "r")' in query
+    assert 'pr_1: repository(owner: "o", name: "other")' in query
+    assert "pullRequest(number: 7)" in query
+
+
+def test_details_are_cached_and_copied(github):
+    github.replies.append({"data": {"pr_0": {"pullRequest": _pr_node(1, "a")}}})
+    
+    first = asyncio.run(github.get_pr_details("o", "r", 1))
+    first["title"] = "mutated"
+    second = asyncio.run(github.get_pr_details("o", "r", 1))
+    
+    assert second["title"] == "a"
+    assert len(github.requests) == 1
+    assert github._pr_cache_locks == {}
+
+
+def test_failed_fetch_keeps_callers_serialised(github):
+    fetches = []
+    active = []
+    
+    async def fetch():
+        fetches.append(len(active))
+        active.append(None)
+        await asyncio.sleep(0.01)
+        active.pop()
+        if len(fetches) == 1:
+            raise RuntimeError("boom")
+        return {"title": "a"}
+    
+    async def scenario():
+        key = ("details", "o", "r", 1)
+        first = [asyncio.create_task(github._get_cached(key, fetch)) for _ in range(3)]
+        await asyncio.sleep(0.015)  # first fetch has failed; two callers still queued
+        late = [asyncio.create_task(github._get_cached(key, fetch)) for _ in range(3)]
+        return await asyncio.gather(*first, *late, return_exceptions=True)
+    
+    results = asyncio.run(scenario())
+    
+    assert isinstance(results[0], RuntimeError)
+    assert results[1:] == [{"title": "a"}] * 5
+    assert fetches == [0, 0]  # one retry, never overlapping another fetch
+    assert github._pr_cache_locks == {}
+
+
+def _diff_reply(text: str, etag=None, status: int = 200) -> httpx.Response:
+    headers = {"ETag": etag} if etag else {}
+    return httpx.Response(status, text=text, headers=headers)
+
+
+def test_diff_revalidates_with_etag(github):
+    github.replies += [_diff_reply("diff v1", etag='"v1"'), _diff_reply("", status=304)]
+    
+    first = asyncio.run(github.get_pr_diff("o", "r", 1))
+    second = asyncio.run(github.get_pr_diff("o", "r", 1))
+    
+    assert first == second == "diff v1"
+    assert "If-None-Match" not in github.requests[0].headers
+    assert github.requests[1].headers["If-None-Match"] == '"v1"'
+    assert github.requests[1].headers["Accept"] == "application/vnd.github.v3.diff"
+
+
+def test_diff_cache_replaced_on_new_etag(github):
+    github.replies += [
+        _diff_reply("diff v1", etag='"v1"'),
+        _diff_reply("diff v2", etag='"v2"'),
+        _diff_reply("", status=304),
+    ]
+    
+    asyncio.run(github.get_pr_diff("o", "r", 1))
+    assert asyncio.run(github.get_pr_diff("o", "r", 1)) == "diff v2"
+    assert asyncio.run(github.get_pr_diff("o", "r", 1)) == "diff v2"
+    assert github.requests[2].headers["If-None-Match"] == '"v2"'
+
+
+def test_diff_without_etag_is_not_cached(github):
+    github.replies += [_diff_reply("diff v1"), _diff_reply("diff v1")]
+    
+    asyncio.run(github.get_pr_diff("o", "r", 1))
+    asyncio.run(github.get_pr_diff("o", "r", 1))
+    
+    assert github._diff_cache == {}
+    assert "If-None-Match" not in github.requests[1].headers
+
+
+def test_diff_cache_evicts_least_recently_used(github, monkeypatch):
+    monkeypatch.setattr(github_module, "DIFF_CACHE_SIZE", 2)
+    github.replies += [_diff_reply(f"diff {n}", etag=f'"{n}"') for n in (1, 2)]
+    github.replies += [_diff_reply("", status=304), _diff_reply("diff 3", etag='"3"')]
+    
+    async def scenario():
+        await github.get_pr_diff("o", "r", 1)
+        await github.get_pr_diff("o", "r", 2)
+        await github.get_pr_diff("o", "r", 1)  # refreshes PR 1
+        await github.get_pr_diff("o", "r", 3)  # evicts PR 2
+    
+    asyncio.run(scenario())
+    
+    assert list(github._diff_cache) == [("o", "r", 1), ("o", "r", 3)]
+
+
+def test_instances_with_same_token_share_one_client():
+    first = GitHubClient(token="shared-token")
+    second = GitHubClient(token="shared-token")
+    
+    assert first.client is second.client
+    assert github_module._SHARED_CLIENTS[first._client_key] == (first.client, 2)
+    
+    asyncio.run(first.close())
+    assert not second.client.is_closed
+    assert github_module._SHARED_CLIENTS[second._client_key] == (second.client, 1)
+    
+    asyncio.run(second.close())
+    assert second.client.is_closed
+    assert second._client_key not in github_module._SHARED_CLIENTS
+
+
+def test_close_is_idempotent():
+    first = GitHubClient(token="idempotent-token")
+    second = GitHubClient(token="idempotent-token")
+    
+    asyncio.run(first.close())
+    asyncio.run(first.close())
+    
+    assert not second.client.is_closed
+    asyncio.run(second.close())
+
+
+def test_stale_instance_does_not_release_replacement_client():
+    stale = GitHubClient(token="replaced-token")
+    asyncio.run(stale.client.aclose())  # closed outside close()
+    current = GitHubClient(token="replaced-token")
+    other = GitHubClient(token="replaced-token")
+    
+    assert current.client is not stale.client
+    asyncio.run(stale.close())
+    
+    assert not current.client.is_closed
+    assert github_module._SHARED_CLIENTS[current._client_key] == (current.client, 2)
+    asyncio.run(current.close())
+    asyncio.run(other.close())
+    assert other.client.is_closed
@@ -0,0 +1,189 @@
+"""
+Tests for CodeReviewer diff filtering.
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from ai_agent_pr_review import reviewer as reviewer_module
+from ai_agent_pr_review.reviewer import (
+    CodeReviewer,
+    DEFAULT_EXCLUDE_PATTERNS,
+    TRUNCATION_MARKER,
+)
+
+
+def _file_section(path: str, added_lines: int = 1) -> bytes:
+    body = "".join(f"+line {i}\n" for i in range(added_lines))
+    return (
+        f"diff --git a/{path} b/{path}\n"
+        f"index 1111111..2222222 100644\n"
+        f"--- a/{path}\n"
+        f"+++ b/{path}\n"
+        f"@@ -0,0 +1,{added_lines} @@\n"
+        f"{body}"
+    ).encode("utf-8")
+
+
+BINARY_SECTION = (
+    b"diff --git a/logo.png b/logo.png\n"
+    b"index 1111111..2222222 100644\n"
+    b"Binary files a/logo.png and b/logo.png differ\n"
+)
+
+
+@pytest.fixture
+def reviewer(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    return CodeReviewer(provider="openai")
+
+
+def test_returns_original_object_when_nothing_dropped(reviewer):
+    diff = _file_section("app.py") + _file_section("lib/util.py")
+    
+    result = reviewer._filter_diff(diff, DEFAULT_EXCLUDE_PATTERNS, None, 500)
+    
+    assert result is diff
+
+
+def test_drops_binary_sections(reviewer):
+    diff = _file_section("app.py") + BINARY_SECTION
+    
+    result = reviewer._filter_diff(diff, None, None, None)
+    
+    assert result == _file_section("app.py")
+
+
+@pytest.mark.parametrize("path", [
+    "poetry.lock",
+    "assets/icon.svg",
+    "static/app.min.js",
+    "dist/bundle.js",
+    "workers/edge/dist/worker.js",
+    "node_modules/pkg/index.js",
+    "workers/edge/node_modules/x/index.js",
+    "vendor/lib.go",
+    "third_party/vendor/lib.go",
+])
+def test_default_excludes(reviewer, path):
+    diff = _file_section("app.py") + _file_section(path)
+    
+    result = reviewer._filter_diff(diff, DEFAULT_EXCLUDE_PATTERNS, None, None)
+    
+    assert result == _file_section("app.py")
+
+
+def test_path_containing_b_slash_is_matched_on_full_path(reviewer):
+    diff = _file_section("my b/x.lock") + _file_section("app.py")
+    
+    result = reviewer._filter_diff(diff, ["my b/*.lock"], None, None)
+    
+    assert result == _file_section("app.py")
+
+
+def test_git_quoted_paths_are_unquoted_before_matching(reviewer):
+    quoted = (
+        b'diff --git "a/caf\\303\\251.lock" "b/caf\\303\\251.lock"\n'
+        b"index 1111111..2222222 100644\n"
+        b'--- "a/caf\\303\\251.lock"\n'
+        b'+++ "b/caf\\303\\251.lock"\n'
+        b"@@ -1 +1 @@\n-x\n+y\n"
+    )
+    quoted_binary = (
+        b'diff --git "a/t\\303\\251st \\"1\\".png" "b/t\\303\\251st \\"1\\".png"\n'
+        b"new file mode 100644\n"
+    )
+    diff = quoted + quoted_binary + _file_section("app.py")
+    
+    result = reviewer._filter_diff(diff, ["café.lock", 'tést "1".png'], None, None)
+    
+    assert result == _file_section("app.py")
+
+
+def test_plain_unified_diff_honours_exclude_patterns(reviewer):
+    diff = (
+        b"--- a/yarn.lock\n+++ b/yarn.lock\n@@ -1 +1 @@\n-x\n+y\n"
+        b"--- a/app.py\n+++ b/app.py\n@@ -1 +1 @@\n-x\n+y\n"
+    )
+    
+    result = reviewer._filter_diff(diff, ["*.lock"], None, None)
+    
+    assert result == b"--- a/app.py\n+++ b/app.py\n@@ -1 +1 @@\n-x\n+y\n"
+
+
+def test_max_files(reviewer):
+    diff = _file_section("a.py") + _file_section("b.py") + _file_section("c.py")
+    
+    result = reviewer._filter_diff(diff, None, 2, None)
+    
+    assert result == _file_section("a.py") + _file_section("b.py")
+
+
+def test_truncation_keeps_headers_and_hunk_body_budget(reviewer):
+    diff = _file_section("app.py", added_lines=10)
+    
+    result = reviewer._filter_diff(diff, None, None, 3)
+    
+    assert result == (
+        b"diff --git a/app.py b/app.py\n"
+        b"index 1111111..2222222 100644\n"
+        b"--- a/app.py\n"
+        b"+++ b/app.py\n"
+        b"@@ -0,0 +1,10 @@\n"
+        b"+line 0\n+line 1\n+line 2\n"
+        + TRUNCATION_MARKER
+    )
+
+
+def test_short_sections_are_not_truncated(reviewer):
+    diff = _file_section("app.py", added_lines=3)
+    
+    assert reviewer._filter_diff(diff, None, None, 3) is diff
+
+
+def _mock_openai(reviewer, statuses):
+    """Route reviewer's OpenAI calls to a transport replying with statuses in order."""
+    calls = []
+    
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(statuses[len(calls) - 1], content=b'{"ok": true}')
+    
+    reviewer._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return calls
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    async def sleep(_delay):
+        return None
+    monkeypatch.setattr(reviewer_module.asyncio, "sleep", sleep)
+
+
+def test_openai_call_retries_rate_limits(reviewer, no_sleep):
+    calls = _mock_openai(reviewer, [429, 503, 200])
+    
+    assert asyncio.run(reviewer._call_openai(b"{}")) == b'{"ok": true}'
+    assert len(calls) == 3
+
+
+def test_openai_call_gives_up_after_max_retries(reviewer, no_sleep):
+    calls = _mock_openai(reviewer, [429] * 3)
+    
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(reviewer._call_openai(b"{}"))
+    assert len(calls) == 3
+
+
+def test_openai_call_honours_base_url(monkeypatch, no_sleep):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_BASE_URL", "https://proxy.example/v1/")
+    monkeypatch.setenv("OPENAI_ORG_ID", "org-123")
+    reviewer = CodeReviewer(provider="openai")
+    calls = _mock_openai(reviewer, [200])
+    
+    asyncio.run(reviewer._call_openai(b"{}"))
+    
+    assert str(calls[0].url) == "https://proxy.example/v1/chat/completions"
+    assert calls[0].headers["OpenAI-Organization"] == "org-123"